@@ -6,5 +6,6 @@ class Paths:
 
     project = Path(__file__).resolve().parent.parent
     raw_data = project / "raw_data"
+    cache = raw_data / ".cache"
     output = project / "output"
     scripts = project / "scripts"
@@ -1,5 +1,6 @@
 import json
 import os
+from pathlib import Path
 
 import pandas as pd
 
@@ -14,32 +15,35 @@ def df_to_key_number_dict(
     if isinstance(value_columns, str):
         value_columns = [value_columns]
 
-    return (
-        df.assign(indicator=indicator_name)
-        .filter(["indicator", id_column] + value_columns, axis=1)
-        .groupby(["indicator"], observed=True, dropna=False)
-        .apply(
-            lambda x: x.set_index(id_column)[value_columns]
-            .astype(str)
-            .to_dict(orient="index")
-        )
-        .to_dict()
-    )
+    # Python values rather than numpy scalars, so the keys can be written to json
+    ids = df[id_column].tolist()
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Values in '{id_column}' must be unique.")
+
+    values = [df[column].to_numpy() for column in value_columns]
+
+    return {
+        indicator_name: {
+            id_: {column: str(value) for column, value in zip(value_columns, row)}
+            for id_, *row in zip(ids, *values)
+        }
+    }
 
 
 def update_key_number(path: str, new_dict: dict) -> None:
     """Update a key number json by updating it with a new dictionary"""
 
-    # Check if the file exists, if not create
-    if not os.path.exists(path):
-        with open(path, "w") as f:
-            json.dump({}, f)
+    path = Path(path)
 
-    with open(path, "r") as f:
-        data = json.load(f)
+    # Read the existing key numbers, starting from scratch if the file doesn't exist
+    try:
+        data = json.loads(path.read_text())
+    except FileNotFoundError:
+        data = {}
 
-    for k in new_dict.keys():
-        data[k] = new_dict[k]
+    data.update(new_dict)
 
-    with open(path, "w") as f:
-        json.dump(data, f, indent=4)
+    # Write to a temporary file and swap it in, so the json is never half-written
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(data, indent=4))
+    os.replace(tmp_path, path)
@@ -9,7 +9,6 @@ DATA COMES FROM BEHIND A PAYWALL. DO NOT SHARE RAW DATA PUBLICLY.
 import pandas as pd
 from scripts import config
 from bblocks import add_iso_codes_column, clean_numeric_series, convert_id
-import numpy as np
 from scripts.tools import update_key_number
 
 
@@ -52,19 +51,21 @@ def add_iso_codes(df: pd.DataFrame) -> pd.DataFrame:
     # Change CAR to central african republic as CAR not recognised
     df.country = df.country.replace("CAR", "Central African Republic")
 
-    # add iso columns based on country names
-    df = add_iso_codes_column(
-        df,
+    # Match iso codes once per distinct country name rather than once per row
+    countries = add_iso_codes_column(
+        pd.DataFrame({"country": df["country"].unique()}),
         id_column="country",
         id_type="regex",
         target_column="iso_code",
     )
+    iso_codes = dict(zip(countries["country"], countries["iso_code"]))
 
     # Global stockpile is the only unmatched entry. Manually change iso_code to
     # global_stockpile.
-    df["iso_code"] = np.where(
-        df["country"] == "Global Stockpile", "global_stockpile", df["iso_code"]
-    )
+    iso_codes["Global Stockpile"] = "global_stockpile"
+
+    # add iso column based on country names
+    df["iso_code"] = df["country"].map(iso_codes)
 
     return df
 
@@ -82,9 +83,13 @@ def _convert_india_region_entries_to_india(df: pd.DataFrame) -> pd.DataFrame:
     Returns: pd.DataFrame of raw data with 'India: Region' rows changed to 'India'.
     """
 
-    df["country"] = np.where(
-        df["country"].str.startswith("India:"), "India", df["country"]
-    )
+    # Match the prefix on the distinct country names only, then replace by lookup
+    india_regions = {
+        country: "India"
+        for country in df["country"].dropna().unique()
+        if country.startswith("India:")
+    }
+    df["country"] = df["country"].replace(india_regions)
 
     return df
 
@@ -102,13 +107,17 @@ def add_continent_column(df: pd.DataFrame) -> pd.DataFrame:
 
     manual_changes = {"global_stockpile": "global_stockpile"}
 
-    df["continent"] = convert_id(
-        df.iso_code,
+    # Convert each distinct iso code once, then map the result onto every row
+    iso_codes = df["iso_code"].drop_duplicates()
+    continents = convert_id(
+        iso_codes,
         from_type="ISO3",
         to_type="Continent",
         additional_mapping=manual_changes,
     )
 
+    df["continent"] = df["iso_code"].map(dict(zip(iso_codes, continents)))
+
     return df
 
 
@@ -135,7 +144,9 @@ def vaccine_demand_by_region_year(df: pd.DataFrame) -> pd.DataFrame:
 def pivot_by_continent(df: pd.DataFrame) -> pd.DataFrame:
     """
     Pivots the table to create columns for each continent, filled with the
-    total_required_supply, for each year.
+    total_required_supply, for each year. The data is already aggregated, so it is
+    unstacked rather than re-aggregated with pivot_table. Years with no data for a
+    continent are filled with 0.
 
     Args:
         df: pd.DataFrame of vaccine demand data by continent and year.
@@ -143,9 +154,12 @@ def pivot_by_continent(df: pd.DataFrame) -> pd.DataFrame:
     Returns: pd.DataFrame with year index and columns for each continent filled with
             'total_required_supply' values.
     """
-    return df.pivot_table(
-        index="year", columns="continent", values="total_required_supply", sort=True
-    ).reset_index()
+    return (
+        df.dropna(subset=["continent"])
+        .set_index(["year", "continent"])["total_required_supply"]
+        .unstack("continent", fill_value=0)
+        .reset_index()
+    )
 
 
 def add_all_other_regions_and_total_columns(df: pd.DataFrame) -> pd.DataFrame:
@@ -158,17 +172,9 @@ def add_all_other_regions_and_total_columns(df: pd.DataFrame) -> pd.DataFrame:
     Returns: pd.DataFrame with additional columns for 'non_africa' and global 'Total'
     """
 
-    # convert global_stockpile's NaN values to 0s to prevent error in later aggregation
-    df.global_stockpile = df.global_stockpile.fillna(0)
-
     # Add non_africa column
-    df["non_Africa"] = (
-        df["America"]
-        + df["Asia"]
-        + df["Europe"]
-        + df["Oceania"]
-        + df["global_stockpile"]
-    )
+    non_africa = ["America", "Asia", "Europe", "Oceania", "global_stockpile"]
+    df["non_Africa"] = df[non_africa].sum(axis=1)
 
     # Add total column
     df["Total"] = df["Africa"] + df["non_Africa"]
@@ -199,12 +205,11 @@ def add_share_of_total_column(df: pd.DataFrame) -> pd.DataFrame:
         "non_Africa",
     ]
 
-    # Loop through each continent, calculating a new share of total column.
-    for continent in continents:
-        share_column = f"{continent}_share"
-        df[share_column] = df[continent] / df["Total"]
+    # Divide every continent column by the total in one go, naming the results
+    # 'continent_share'.
+    shares = df[continents].div(df["Total"], axis=0).add_suffix("_share")
 
-    return df
+    return pd.concat([df, shares], axis=1)
 
 
 def reformat_data_for_dashed_projections(
@@ -227,15 +232,13 @@ def reformat_data_for_dashed_projections(
     'Africa_share_projected', which shows the data after projections have started.
     """
 
+    year = df["year"]
+
     # Add measured data column
-    df["Africa_share_measured"] = np.where(
-        df["year"] <= last_year_measured, df["Africa_share"], np.nan
-    )
+    df["Africa_share_measured"] = df["Africa_share"].where(year <= last_year_measured)
 
     # Add projected data column
-    df["Africa_share_projected"] = np.where(
-        df["year"] >= last_year_measured, df["Africa_share"], np.nan
-    )
+    df["Africa_share_projected"] = df["Africa_share"].where(year >= last_year_measured)
 
     return df
 
@@ -257,6 +260,11 @@ def vaccine_dose_demand_by_country_year_pipeline(df: pd.DataFrame) -> pd.DataFra
     # add iso codes and continent columns
     df = add_iso_codes(df).pipe(add_continent_column)
 
+    # convert repeated string columns to category so grouping works on integer codes
+    df = df.astype(
+        {"country": "category", "vaccine": "category", "continent": "category"}
+    )
+
     # convert total_required_supply to float
     df = clean_numeric_series(data=df, series_columns="total_required_supply", to=float)
 
@@ -290,7 +298,7 @@ def vaccine_demand_key_numbers(df: pd.DataFrame):
     Return: Dictionary of indicator name and value.
     """
 
-    africa_demand_2030 = df.query("year == 2030")["Africa_share_projected"].item()
+    africa_demand_2030 = df.set_index("year").at[2030, "Africa_share_projected"]
 
     key_numbers = {
         "africa_share_of_global_vaccine_demand_2030": f"{africa_demand_2030:.1%}"
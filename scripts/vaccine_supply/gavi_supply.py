@@ -15,45 +15,58 @@ Our methodology goes as follows:
     - Sums the 6 countries share of Gavi funded total
 """
 
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
 import camelot
 import pandas as pd
 from bblocks import clean_numeric_series
-from camelot.core import TableList
 from scripts import config
 from scripts.config import Paths
+from scripts.logger import logger
 from scripts.tools import update_key_number
 
+gavi_pdf = config.Paths.raw_data / "Gavi-shipments-2023.pdf"
+
+# Version of the cleaning steps in `load_gavi_data`. Bump this whenever they change so
+# that cached data cleaned by older code is not reused.
+gavi_cache_version = 1
+
+# Location of the data in the table on each page. Every page uses the same rows and
+# columns except for the first page and page 13, which are overridden below.
 gavi_settings = {
+    page: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]} for page in range(28)
+} | {
     0: {"first_row": 4, "keep_cols": [0, 1, 2, 3, 4, 6, 8]},
-    1: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    2: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    3: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    4: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    5: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    6: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    7: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    8: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    9: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    10: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    11: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
     12: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 8]},
-    13: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    14: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    15: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    16: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    17: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    18: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    19: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    20: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    21: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    22: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    23: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    24: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    25: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    26: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
-    27: {"first_row": 0, "keep_cols": [0, 1, 2, 3, 4, 6, 7]},
 }
 
+# Non-vaccine lines in dataset
+gavi_non_vaccines = frozenset(
+    {
+        "AD-Syringe, 0.5 ml",
+        "AD-Syringe, 0.1 ml",
+        "RUP-2.0 ml",
+        "RUP-5.0 ml",
+        "Safety Box, 5 Litre",
+    }
+)
+
+# Countries transitioning away from Gavi support
+gavi_transitioning_countries = frozenset(
+    {
+        "Sao Tome & Principe",
+        "Nigeria",
+        "Kenya",
+        "Ghana",
+        "Djibouti",
+        "Cote d'Ivoire",
+    }
+)
+
 
 def load_gavi_data(page_settings: dict) -> pd.DataFrame:
     """
@@ -64,7 +77,8 @@ def load_gavi_data(page_settings: dict) -> pd.DataFrame:
     relevant rows and columns that form each table (excluding 'planned delivery month'
     which was regularly blanked and therefore not scraped), before stacking the tables
     from each page into one pd.DataFrame. Function cleans final DataFrame to reflect
-    original table in the PDF.
+    original table in the PDF. The cleaned DataFrame is cached as parquet, so the PDF
+    is only scraped again when the PDF or the page settings change.
 
     Args:
         page_settings (dict): Dictionary describing the location of relevant data in
@@ -73,8 +87,13 @@ def load_gavi_data(page_settings: dict) -> pd.DataFrame:
     Returns: pd.DataFrame of Gavi Shipments 2023 Vaccines - All Regions dataset.
     """
 
-    # Read the tables and stores as a list of tables.
-    tables = read_tables()
+    # Return the cached data if the PDF has already been scraped with these settings.
+    cache_path = _cache_path(page_settings)
+    if cache_path.exists():
+        return pd.read_parquet(cache_path)
+
+    # Read the tables on each page and store them by page number.
+    tables = read_tables(pages=list(page_settings))
 
     # Concatenates each table from the tables list into a dataframe. Filters each table
     # for relevant data.
@@ -82,29 +101,106 @@ def load_gavi_data(page_settings: dict) -> pd.DataFrame:
 
     # Clean table columns (merging columns which contain the same data for different
     # countries).
-    data = clean_numeric_series(data, series_columns=[7, 8], to=float)
+    data = _to_numeric(data, columns=[7, 8])
     data["9"] = data[7].fillna(0) + data[8].fillna(0)
     data = data.drop(labels=[7, 8], axis=1)
 
     # Rename columns to match original PDFs
     data = set_column_names(data)
 
+    # Cache the cleaned data for future runs. The cache is only an optimisation, so
+    # a failed write (e.g. no parquet engine installed) still returns the data.
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        data.to_parquet(cache_path, compression="zstd")
+    except (ImportError, OSError) as error:
+        logger.warning(f"Could not cache the Gavi data: {error}")
+
     return data
 
 
-def read_tables():
+def _cache_path(page_settings: dict) -> Path:
+    """
+    Builds the path of the parquet cache for the Gavi PDF. The file name is a hash of
+    the PDF contents, the page settings and `gavi_cache_version`, so a change to any of
+    them invalidates the cache.
+
+    Args:
+        page_settings (dict): Dictionary describing the location of relevant data in
+                              scraped tables.
+
+    Returns: Path to the cached parquet file.
     """
-    Reads PDF tables and stores them as a list of tables.
+    digest = hashlib.blake2b(gavi_pdf.read_bytes(), digest_size=16)
+    digest.update(repr(page_settings).encode())
+    digest.update(str(gavi_cache_version).encode())
+
+    return config.Paths.cache / f"{digest.hexdigest()}.parquet"
 
-    Returns: List of tables containing data from the Gavi Shipments 2023 Vaccines - All
-    Regions report.
+
+def _to_numeric(data: pd.DataFrame, columns: list[int]) -> pd.DataFrame:
     """
-    filepath = str(config.Paths.raw_data / "Gavi-shipments-2023.pdf")
-    return camelot.read_pdf(filepath, pages="1-28", flavor="stream")
+    Converts scraped string columns to floats. Values are parsed directly once
+    thousands separators are removed, and only the values that fail to parse are
+    cleaned with bblocks' `clean_numeric_series`.
+
+    Args:
+        data (pd.DataFrame): DataFrame of scraped PDF tables.
+        columns (list[int]): Columns to convert.
+
+    Returns: pd.DataFrame with the columns converted to floats.
+    """
+    for column in columns:
+        values = pd.to_numeric(
+            data[column].str.replace(",", "", regex=False), errors="coerce"
+        )
+
+        # Fall back to the slower cleaner for values the fast path couldn't parse
+        failed = values.isna() & data[column].notna()
+        if failed.any():
+            values[failed] = clean_numeric_series(
+                data.loc[failed, [column]], series_columns=[column], to=float
+            )[column]
+
+        data[column] = values
+
+    return data
+
+
+def read_tables(pages: list[int]) -> dict[int, pd.DataFrame]:
+    """
+    Reads PDF tables and stores them by page. Pages are independent, so they are
+    parsed in parallel across a pool of processes.
+
+    Args:
+        pages (list[int]): Zero-based indices of the pages to read.
+
+    Returns: Dictionary of page index to the table on that page of the Gavi Shipments
+    2023 Vaccines - All Regions report.
+    """
+    filepath = str(gavi_pdf)
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        tables = executor.map(partial(_read_page_table, filepath), pages)
+
+        return dict(zip(pages, tables))
+
+
+def _read_page_table(filepath: str, page: int) -> pd.DataFrame:
+    """
+    Reads the table on a single page of the PDF.
+
+    Args:
+        filepath (str): Path to the PDF.
+        page (int): Zero-based index of the page to read.
+
+    Returns: pd.DataFrame of the table on the page.
+    """
+    return camelot.read_pdf(filepath, pages=str(page + 1), flavor="stream")[0].df
 
 
 def concatenate_tables(
-    raw_data: TableList,
+    raw_data: dict[int, pd.DataFrame],
     page_settings: dict,
 ) -> pd.DataFrame:
     """stacks tables from multiple pages of a pdf into a single dataframe. For each
@@ -112,29 +208,30 @@ def concatenate_tables(
     year's pdf.
 
     Args:
-        raw_data (TableList): the list of tables scraped using the read_table function
+        raw_data (dict): the tables scraped using the read_tables function, by page
         page_settings (dict): a dictionary with the required pdf characteristics to
                               determine how to clean the raw_data.
 
     Returns: pd.DataFrame containing all data from the PDF.
     """
 
-    # Create an empty dataframe to store all the tables
-    final_df = pd.DataFrame()
+    # Create an empty list to store the tables from each page
+    frames = []
 
     # Loop through each page, locating the data tables and keeping relevant data
     for page, settings in page_settings.items():
-        df = raw_data[page].df
+        df = raw_data[page]
         df = _filter_rows_columns(
             df=df,
             first_row=settings["first_row"],
             keep_cols=settings["keep_cols"],
         )
 
-        # Add each table to final pd.DataFrame
-        final_df = pd.concat([final_df, df], ignore_index=False)
+        # Add each table to the list of tables
+        frames.append(df)
 
-    return final_df
+    # Stack all tables into a single pd.DataFrame in one go
+    return pd.concat(frames, ignore_index=True)
 
 
 def _filter_rows_columns(df: pd.DataFrame, first_row: int, keep_cols: list[int]):
@@ -186,16 +283,7 @@ def remove_non_vaccines(df: pd.DataFrame) -> pd.DataFrame:
             data
     """
 
-    # List of non-vaccine lines in dataset
-    non_vaccines = [
-        "AD-Syringe, 0.5 ml",
-        "AD-Syringe, 0.1 ml",
-        "RUP-2.0 ml",
-        "RUP-5.0 ml",
-        "Safety Box, 5 Litre",
-    ]
-
-    return df.loc[lambda d: ~d["product"].isin(non_vaccines)]
+    return df.loc[lambda d: ~d["product"].isin(gavi_non_vaccines)]
 
 
 def add_share_of_total_column(df: pd.DataFrame) -> pd.DataFrame:
@@ -222,17 +310,7 @@ def filter_for_six_transitioning_countries(df: pd.DataFrame) -> pd.DataFrame:
              anticipated to move away from Gavi support by 2030
     """
 
-    # List of countries transitioning away from Gavi support
-    countries = [
-        "Sao Tome & Principe",
-        "Nigeria",
-        "Kenya",
-        "Ghana",
-        "Djibouti",
-        "Cote d'Ivoire",
-    ]
-
-    return df.loc[lambda d: d.country.isin(countries)]
+    return df.loc[lambda d: d.country.isin(gavi_transitioning_countries)]
 
 
 def share_of_gavi_vaccine_supply_to_six_transitioning_countries_pipeline(
@@ -253,14 +331,25 @@ def share_of_gavi_vaccine_supply_to_six_transitioning_countries_pipeline(
                 and merges it with other key numbers in key_numbers.json
     """
 
-    # Filter to remove non-vaccine transfers
-    data = remove_non_vaccines(data)
+    # Convert repeated string columns to category so filters and grouping work on
+    # integer codes
+    data = data.astype(
+        {"country": "category", "product": "category", "gavi_non_gavi": "category"}
+    )
 
-    # Filter for fully gavi funded data
+    # Filter for fully gavi funded data. This single equality check drops the
+    # co-financed lines before the set lookup on products below.
     data = data.loc[lambda d: d.gavi_non_gavi == "GAVI"]
 
+    # Filter to remove non-vaccine transfers
+    data = remove_non_vaccines(data)
+
     # Sum by country
-    data = data.groupby(["country"])["total_quantity_in_doses"].sum().reset_index()
+    data = (
+        data.groupby(["country"], observed=True)["total_quantity_in_doses"]
+        .sum()
+        .reset_index()
+    )
 
     # Calculate share of total vaccines by country
     data = add_share_of_total_column(data)
@@ -284,8 +373,10 @@ if __name__ == "__main__":
     # Read PDF into pd.DataFrame
     DATA = load_gavi_data(page_settings=gavi_settings)
 
-    # Save raw data to output folder
+    # Save raw data to output folder. The xlsx is the shared, annotated copy; the
+    # parquet copy keeps dtypes and is much faster to read back in code.
     DATA.to_excel(Paths.output / "gavi_vaccine_supply.xlsx", index=False)
+    DATA.to_parquet(Paths.output / "gavi_vaccine_supply.parquet", compression="zstd")
 
     # Calculate key number
     gavi_supply_share = (
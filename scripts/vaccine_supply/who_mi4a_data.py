@@ -1,4 +1,3 @@
-import numpy as np
 import pandas as pd
 
 from scripts import config
@@ -8,13 +7,18 @@ from scripts.tools import update_key_number
 def import_who_data() -> pd.DataFrame:
     """
     Imports the excel spreadsheet shared by WHO. Contains 4 tables which are not
-    formatted for use in python. Needs cleaning below in `get_data_table`.
+    formatted for use in python. Only the block of cells holding the tables
+    (C12:F45) is read. Needs cleaning below in `get_data_table`.
 
     Returns: pd.DataFrame of raw data.
     """
     return pd.read_excel(
         config.Paths.raw_data / "GVMR 2023 - ONE Campaign May 2024_vShared.xlsx",
         sheet_name="FOR ONE Campaign",
+        header=None,
+        usecols="C:F",
+        skiprows=11,
+        nrows=34,
     )
 
 
@@ -31,12 +35,13 @@ def get_data_table(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
              error.
     """
 
-    # Dictionary to store dimensions / location of tables within spreadsheet.
+    # Dictionary to store dimensions / location of tables within the block of cells
+    # read by `import_who_data`.
     table_locations = {
-        "with_covid_who_region": {"rows": slice(10, 17), "columns": slice(2, 6)},
-        "with_covid_continent": {"rows": slice(18, 25), "columns": slice(2, 6)},
-        "without_covid_who_region": {"rows": slice(29, 36), "columns": slice(2, 6)},
-        "without_covid_continent": {"rows": slice(37, 44), "columns": slice(2, 6)},
+        "with_covid_who_region": {"rows": slice(0, 7), "columns": slice(0, 4)},
+        "with_covid_continent": {"rows": slice(8, 15), "columns": slice(0, 4)},
+        "without_covid_who_region": {"rows": slice(19, 26), "columns": slice(0, 4)},
+        "without_covid_continent": {"rows": slice(27, 34), "columns": slice(0, 4)},
     }
 
     # Sets dimensions from table_locations dictionary
@@ -114,8 +119,16 @@ def reorder_rows_for_data_vis(df: pd.DataFrame) -> pd.DataFrame:
         "Oceania",
     ]
 
+    # Position of each row in the desired order. Rows not in the list are dropped.
+    position = (
+        df["manufacturer_hq"]
+        .map({name: i for i, name in enumerate(desired_order)})
+        .dropna()
+        .sort_values()
+    )
+
     # Create the reordered DataFrame
-    df_reordered = df.set_index("manufacturer_hq").reindex(desired_order).reset_index()
+    df_reordered = df.loc[position.index].reset_index(drop=True)
 
     return df_reordered
 
@@ -133,12 +146,12 @@ def add_new_columns_for_flourish(df: pd.DataFrame) -> pd.DataFrame:
     data for other continents ('non_africa')
     """
 
-    df["africa"] = np.where(
-        df["manufacturer_hq"] == "Africa", df["share_of_global_vaccine_supply"], 0
-    )
-    df["non_africa"] = np.where(
-        df["manufacturer_hq"] != "Africa", df["share_of_global_vaccine_supply"], 0
-    )
+    # Compare once and reuse the mask for both columns
+    is_africa = df["manufacturer_hq"] == "Africa"
+    share = df["share_of_global_vaccine_supply"]
+
+    df["africa"] = share.where(is_africa, 0)
+    df["non_africa"] = share.mask(is_africa, 0)
 
     return df
 
@@ -177,23 +190,27 @@ def supply_key_numbers(df: pd.DataFrame):
 
     df = df.set_index("manufacturer_hq").astype(float).reset_index()
 
-    afr_to_world = df.query("manufacturer_hq == 'Africa'")["vaccines_to_world"].sum()
-    asia_to_world = df.query("manufacturer_hq == 'Asia'")["vaccines_to_world"].sum()
-    na_to_world = df.query("manufacturer_hq == 'North America'")[
-        "vaccines_to_world"
+    # Totals by manufacturer region, computed in a single pass
+    totals = df.groupby("manufacturer_hq")[
+        ["vaccines_to_world", "vaccines_to_africa"]
     ].sum()
-    eur_to_world = df.query("manufacturer_hq == 'Europe'")["vaccines_to_world"].sum()
-    afr_prod_share = afr_to_world / df.vaccines_to_world.sum()
-    asia_prod_share = asia_to_world / df.vaccines_to_world.sum()
-    na_prod_share = na_to_world / df.vaccines_to_world.sum()
-    eur_prod_share = eur_to_world / df.vaccines_to_world.sum()
+    world_total = totals["vaccines_to_world"].sum()
+    africa_total = totals["vaccines_to_africa"].sum()
 
-    world_to_afr = df.vaccines_to_africa.sum() / df.vaccines_to_world.sum()
+    afr_to_world = totals.at["Africa", "vaccines_to_world"]
+    asia_to_world = totals.at["Asia", "vaccines_to_world"]
+    na_to_world = totals.at["North America", "vaccines_to_world"]
+    eur_to_world = totals.at["Europe", "vaccines_to_world"]
+    afr_prod_share = afr_to_world / world_total
+    asia_prod_share = asia_to_world / world_total
+    na_prod_share = na_to_world / world_total
+    eur_prod_share = eur_to_world / world_total
+
+    world_to_afr = africa_total / world_total
 
     afr_imported = (
-        df.query("manufacturer_hq != 'Africa'").vaccines_to_africa.sum()
-        / df.vaccines_to_africa.sum()
-    )
+        africa_total - totals.at["Africa", "vaccines_to_africa"]
+    ) / africa_total
 
     key_numbers = {
         "africa_vaccine_production_value": f"{afr_to_world / 1e6:,.1f} million",
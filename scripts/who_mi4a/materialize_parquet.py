@@ -0,0 +1,29 @@
+"""
+Converts the sheets of the MI4A public database used in this analysis to parquet.
+The workbook is a static release, so this only needs to be run once (or again when
+the workbook is replaced). `who_mi4a_database.read_source` then reads the parquet
+copy instead of parsing the workbook on every run.
+"""
+
+from scripts.who_mi4a.who_mi4a_database import parquet_path, stream_excel
+
+
+def materialize_parquet(file_name: str, sheet_name: str) -> None:
+    """
+    Reads a sheet from a workbook in the raw_data folder and saves it as parquet next
+    to the workbook. The sheet is streamed row by row rather than parsed in full.
+
+    Args:
+        file_name (str): Name of the workbook in the raw_data folder.
+        sheet_name (str): Name of the sheet to convert.
+    """
+    stream_excel(file_name=file_name, sheet_name=sheet_name).to_parquet(
+        parquet_path(file_name=file_name, sheet_name=sheet_name), compression="zstd"
+    )
+
+
+if __name__ == "__main__":
+    materialize_parquet(
+        file_name="2023_mi4a_public_database.xlsx",
+        sheet_name="Vaccine Purchase Data",
+    )
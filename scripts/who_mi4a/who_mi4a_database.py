@@ -1,68 +1,178 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import openpyxl
 import pandas as pd
-from scripts.common import manufacturer_to_country, who_regional_mapping
-from bblocks import add_iso_codes_column
 
 from scripts import config
+from scripts.logger import logger
+
+# Column names in the MI4A purchase data sheet and their names in this analysis.
+# Columns not read from the sheet are ignored by rename.
+mi4a_column_names = {
+    "Region": "region",
+    "Income Group": "income_group",
+    "Gavi/Non-Gavi": "gavi_non_gavi",
+    "Country alias 2022": "country",
+    "Year": "year",
+    "Vaccine": "vaccine",
+    "Manufacturer": "manufacturer",
+    "Presentation": "presentation",
+    "Dosage Number": "dosage_number",
+    "Annual Number of Doses": "annual_doses",
+    "WHO PQ": "who_pq",
+    "CommercialName": "commerical_name",
+    "Procurement Mechanism": "procurement_mechanism",
+    "ContractLength": "contract_length",
+    "Price per Dose in USD": "price_per_dose_usd",
+    "INCOTerm": "incoterm",
+    "VATPercent": "vat",
+    "VATName": "vat_name",
+}
+
+
+def read_excel(
+    file_name: str, sheet_name: str, usecols: list[str] | None = None
+) -> pd.DataFrame:
+    return pd.read_excel(
+        config.Paths.raw_data / file_name,
+        sheet_name=sheet_name,
+        usecols=usecols,
+        engine="calamine",
+    )
+
+
+def stream_excel(
+    file_name: str,
+    sheet_name: str,
+    usecols: list[str] | None = None,
+    years: range | None = None,
+) -> pd.DataFrame:
+    # Reads the sheet one row at a time, keeping only the requested columns and the
+    # rows for the requested years, so the full sheet is never held in memory
+    workbook = openpyxl.load_workbook(
+        config.Paths.raw_data / file_name, read_only=True, data_only=True
+    )
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = list(next(rows))
 
+        columns = header if usecols is None else usecols
+        positions = [header.index(column) for column in columns]
+        if years is not None:
+            year = header.index("Year")
+            rows = (row for row in rows if row[year] in years)
 
-def read_excel(file_name: str, sheet_name: str) -> pd.DataFrame:
-    return pd.read_excel(config.Paths.raw_data / file_name, sheet_name=sheet_name)
+        data = [[row[i] for i in positions] for row in rows]
+    finally:
+        workbook.close()
+
+    return pd.DataFrame(data, columns=columns)
+
+
+def parquet_path(file_name: str, sheet_name: str) -> Path:
+    return config.Paths.raw_data / f"{Path(file_name).stem} - {sheet_name}.parquet"
+
+
+def read_source(
+    file_name: str,
+    sheet_name: str,
+    usecols: list[str] | None = None,
+    years: range | None = None,
+) -> pd.DataFrame:
+    # Prefer the parquet copy of the sheet (see materialize_parquet.py) and fall back
+    # to parsing the workbook
+    path = parquet_path(file_name=file_name, sheet_name=sheet_name)
+    if path.exists() and not _is_stale(
+        path, workbook=config.Paths.raw_data / file_name
+    ):
+        # Filter years while reading so only the requested rows are loaded
+        filters = [("Year", "in", list(years))] if years is not None else None
+        return pd.read_parquet(path, columns=usecols, filters=filters)
+
+    if path.exists():
+        logger.warning(
+            f"{path.name} is older than {file_name}; reading the workbook instead. "
+            "Run materialize_parquet.py to refresh it."
+        )
+
+    # When only some years are needed, stream the workbook so the other rows are
+    # dropped as they are read. Otherwise every row is kept anyway and calamine is the
+    # faster parser.
+    if years is not None:
+        return stream_excel(
+            file_name=file_name, sheet_name=sheet_name, usecols=usecols, years=years
+        )
+
+    return read_excel(file_name=file_name, sheet_name=sheet_name, usecols=usecols)
+
+
+def _is_stale(path: Path, workbook: Path) -> bool:
+    # The parquet copy is out of date if the workbook was replaced after it was made
+    return workbook.exists() and workbook.stat().st_mtime > path.stat().st_mtime
 
 
 def rename_columns(df: pd.DataFrame) -> pd.DataFrame:
-    columns = {
-        "Region": "region",
-        "Income Group": "income_group",
-        "Gavi/Non-Gavi": "gavi_non_gavi",
-        "Country alias 2022": "country",
-        "Year": "year",
-        "Vaccine": "vaccine",
-        "Manufacturer": "manufacturer",
-        "Presentation": "presentation",
-        "Dosage Number": "dosage_number",
-        "Annual Number of Doses": "annual_doses",
-        "WHO PQ": "who_pq",
-        "CommercialName": "commerical_name",
-        "Procurement Mechanism": "procurement_mechanism",
-        "ContractLength": "contract_length",
-        "Price per Dose in USD": "price_per_dose_usd",
-        "INCOTerm": "incoterm",
-        "VATPercent": "vat",
-        "VATName": "vat_name",
-    }
-
-    return df.rename(columns=columns)
-
-
-def testing_dosage_number_times_annual_dosage(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.rename(columns={"annual_doses": "annual_doses_original"})
-
-    df["annual_doses"] = df["annual_doses_original"] * df["dosage_number"]
+    return df.rename(columns=mi4a_column_names)
+
+
+def set_categorical_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # Low-cardinality text columns are stored as integer codes. Columns that weren't
+    # read are skipped.
+    columns = [
+        "region",
+        "income_group",
+        "gavi_non_gavi",
+        "vaccine",
+        "manufacturer",
+        "presentation",
+        "procurement_mechanism",
+        "incoterm",
+        "vat_name",
+    ]
 
-    return df
+    return df.astype({c: "category" for c in columns if c in df.columns})
 
 
 def map_manufacturer_to_country_region(
     df: pd.DataFrame, location_mapping: dict, region_mapping: dict
 ) -> pd.DataFrame:
-
-    df["manufacturer_location"] = df["manufacturer"].map(location_mapping)
-
-    df = add_iso_codes_column(
-        df,
+    # Imported here as the step is not part of the active pipeline
+    from bblocks import add_iso_codes_column
+
+    # Match iso codes once per manufacturer in the mapping rather than once per row
+    manufacturers = add_iso_codes_column(
+        pd.DataFrame(
+            {
+                "manufacturer": list(location_mapping),
+                "manufacturer_location": list(location_mapping.values()),
+            }
+        ),
         id_column="manufacturer_location",
         id_type="regex",
         target_column="manufacturer_iso_code",
     )
+    iso_codes = dict(
+        zip(manufacturers["manufacturer"], manufacturers["manufacturer_iso_code"])
+    )
+
+    df["manufacturer_location"] = df["manufacturer"].map(location_mapping)
+    df["manufacturer_iso_code"] = df["manufacturer"].map(iso_codes)
 
     df["manufacturer_region"] = df["manufacturer_iso_code"].map(region_mapping)
 
     return df
 
 
-def keep_year_range(df: pd.DataFrame, year: range) -> pd.DataFrame:
+def keep_year_range(
+    df: pd.DataFrame, year: range, column: str = "year"
+) -> pd.DataFrame:
+
+    # A contiguous range is two comparisons; only stepped ranges need a lookup
+    if year.step != 1:
+        return df.loc[lambda d: d[column].isin(year)]
 
-    return df.loc[lambda d: d.year.isin(year)]
+    return df.loc[lambda d: (d[column] >= year.start) & (d[column] < year.stop)]
 
 
 def aggregate_by_year_manufacturer_region(df: pd.DataFrame) -> pd.DataFrame:
@@ -73,7 +183,13 @@ def aggregate_by_year_manufacturer_region(df: pd.DataFrame) -> pd.DataFrame:
         "year"
     ]
 
-    return df.groupby(by=groupby)["annual_doses"].sum().reset_index()
+    # Carry only the keys and doses through the groupby. observed=True so categorical
+    # keys don't produce empty groups for unused combinations
+    return (
+        df[groupby + ["annual_doses"]]
+        .groupby(by=groupby, observed=True, as_index=False)["annual_doses"]
+        .sum()
+    )
 
 
 def pivot_for_flourish(df: pd.DataFrame) -> pd.DataFrame:
@@ -82,14 +198,44 @@ def pivot_for_flourish(df: pd.DataFrame) -> pd.DataFrame:
     ).reset_index()
 
 
-def who_mi4a_pipeline(years: range) -> pd.DataFrame:
-    df = (
-        read_excel(
+def load_mi4a_data(
+    usecols: list[str] | None = None, years: range | None = None
+) -> pd.DataFrame:
+    # Shared by who_mi4a_pipeline and total_checks, so the workbook is parsed,
+    # renamed and filtered to the years once
+    return (
+        read_source(
             file_name="2023_mi4a_public_database.xlsx",
             sheet_name="Vaccine Purchase Data",
+            usecols=usecols,
+            years=years,
         )
         .pipe(rename_columns)
-        .pipe(keep_year_range, year=years)
+        .pipe(set_categorical_columns)
+    )
+
+
+def load_mi4a_data_in_background(
+    usecols: list[str] | None = None, years: range | None = None
+) -> Future[pd.DataFrame]:
+    # Parquet reads release the GIL, so callers can get on with other work while the
+    # data loads. Parsing the workbook (e.g. openpyxl's pure-Python XML parsing) holds
+    # the GIL, so on that path the load only overlaps with I/O-bound work.
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(load_mi4a_data, usecols=usecols, years=years)
+
+    # Don't block here; the worker thread exits once the load finishes
+    executor.shutdown(wait=False)
+
+    return future
+
+
+def who_mi4a_pipeline(df: pd.DataFrame) -> pd.DataFrame:
+    df = (
+        df
+        # Needs `from scripts.common import manufacturer_to_country,
+        # who_regional_mapping` and "Manufacturer" in the usecols in __main__ when
+        # re-enabled
         # .pipe(
         #     map_manufacturer_to_country_region,
         #     location_mapping=manufacturer_to_country,
@@ -102,23 +248,12 @@ def who_mi4a_pipeline(years: range) -> pd.DataFrame:
     return df
 
 
-def total_checks(final_dataset: pd.DataFrame, years=range) -> pd.DataFrame:
+def total_checks(final_dataset: pd.DataFrame, data: pd.DataFrame) -> pd.DataFrame:
 
-    final_overall_total = (
-        final_dataset.filter(items={"annual_doses"}, axis=1).sum().item()
-    )
-
-    original_dataset = (
-        read_excel(
-            file_name="2023_mi4a_public_database.xlsx",
-            sheet_name="Vaccine Purchase Data",
-        )
-        .pipe(rename_columns)
-        .pipe(testing_dosage_number_times_annual_dosage)
-        .loc[lambda d: d.year.isin(years)]
-    )
+    final_overall_total = final_dataset["annual_doses"].sum()
 
-    overall_total = original_dataset.filter(items={"annual_doses"}, axis=1).sum().item()
+    # Annual doses multiplied by dosage number, summed without adding a column
+    overall_total = data["annual_doses"].mul(data["dosage_number"]).sum()
 
     check = pd.DataFrame(
         {"final_overall_total": [final_overall_total], "overall_total": [overall_total]}
@@ -131,7 +266,15 @@ def total_checks(final_dataset: pd.DataFrame, years=range) -> pd.DataFrame:
 
 if __name__ == "__main__":
     YEARS = range(2019, 2021 + 1)
-    data = who_mi4a_pipeline(years=YEARS)
+
+    # Load the data once and share it between the pipeline and the checks. Only the
+    # columns and years used by either are kept. There is no other work to overlap
+    # with the load here, so wait for it straight away.
+    DATA = load_mi4a_data_in_background(
+        usecols=["Year", "Annual Number of Doses", "Dosage Number"], years=YEARS
+    ).result()
+
+    data = who_mi4a_pipeline(df=DATA)
     # data.to_csv(config.Paths.output / "vaccine_production_by_region.csv", index=False)
 
-    # total_checks = total_checks(final_dataset=data, years=YEARS)
+    # total_checks = total_checks(final_dataset=data, data=DATA)